@@ -5,8 +5,14 @@ import threading
 import random
 import tkinter as tk
 from tkinter import ttk
+from tkinter import filedialog
+from array import array
 import json
 import os
+import hashlib
+import re
+import textwrap
+import unicodedata
 
 class ClipboardTyper:
     def __init__(self):
@@ -19,7 +25,63 @@ class ClipboardTyper:
             'start_delay': 0.5,
             'hotkey': 'ctrl+shift+t',
             'stop_key': 'esc',
-            'theme': 'light'
+            'theme': 'light',
+            # Hybrid mode pastes large segments and only types the rest
+            'hybrid_mode': False,
+            'paste_min_length': 64,
+            'paste_max_length': 2000,
+            'paste_keystroke': 'ctrl+v',
+            'copy_keystroke': 'ctrl+c',
+            'paste_probe': 'select_copy',
+            'paste_probe_delay': 0.15,
+            # Preprocessing stages applied to typed text, in order
+            'preprocess': [],
+            # Segment mode types one line/record of the source per hotkey press
+            'segment_mode': False,
+            'segment_delimiter': '\n',
+            'segment_file': '',
+            'prev_segment_key': 'ctrl+shift+b',
+            'repeat_segment_key': 'ctrl+shift+r',
+            'segment_position': 0,
+            'segment_fingerprint': '',
+            # Delay distribution and bursts: a pause after every burst_length keys
+            'distribution': 'uniform',
+            'burst_length': 0,
+            'burst_pause': 0.0,
+            # Named typing profiles, switchable by hotkey or from the GUI
+            'profile': '',
+            'profiles': {
+                'bulk': {
+                    'min_delay': 0.005,
+                    'max_delay': 0.02,
+                    'start_delay': 0.5,
+                    'distribution': 'uniform',
+                    'burst_length': 0,
+                    'burst_pause': 0.0,
+                    'preprocess': ['normalize_newlines'],
+                    'hotkey': 'ctrl+alt+1'
+                },
+                'human': {
+                    'min_delay': 0.05,
+                    'max_delay': 0.2,
+                    'start_delay': 0.5,
+                    'distribution': 'gauss',
+                    'burst_length': 6,
+                    'burst_pause': 0.3,
+                    'preprocess': ['normalize_newlines'],
+                    'hotkey': 'ctrl+alt+2'
+                },
+                'slow-legacy-app': {
+                    'min_delay': 0.15,
+                    'max_delay': 0.3,
+                    'start_delay': 1.0,
+                    'distribution': 'uniform',
+                    'burst_length': 0,
+                    'burst_pause': 0.0,
+                    'preprocess': ['normalize_newlines', 'typeable'],
+                    'hotkey': 'ctrl+alt+3'
+                }
+            }
         }
         
         print("Starting ClipboardTyper...")
@@ -49,9 +111,61 @@ class ClipboardTyper:
             }
         }
         
+        # Probes used to verify that a pasted segment actually landed
+        self.paste_probes = {
+            'none': self.probe_none,
+            'select_copy': self.probe_select_copy
+        }
+        
+        # Preprocessing stages: generators that take and yield keystrokes.
+        # A keystroke is a single character to type or a longer key name to send.
+        self.preprocess_stages = {
+            'normalize_newlines': self.stage_normalize_newlines,
+            'nfc': self.stage_nfc,
+            'typeable': self.stage_typeable,
+            'dedent': self.stage_dedent,
+            'strip_indent': self.stage_strip_indent,
+            'skip_autoclose': self.stage_skip_autoclose
+        }
+        
+        # Keystrokes going in/out of each stage during the current session
+        self.preprocess_counts = {}
+        
+        # Segment index over the current source, rebuilt only when the source changes
+        self.segment_text = None
+        self.segment_source_key = None
+        self.segment_offsets = array('q')
+        self.segment_position = 0
+        self.position_save_timer = None
+        
+        # Keys a settings file must have to be loaded at all
+        self.required_settings = ['hotkey', 'stop_key', 'min_delay', 'max_delay']
+        
+        # Settings are written from the GUI and from the position save timer
+        self.settings_lock = threading.Lock()
+        
+        # Settings a profile carries over into the active settings
+        self.profile_keys = [
+            'min_delay', 'max_delay', 'start_delay', 'distribution',
+            'burst_length', 'burst_pause', 'preprocess'
+        ]
+        
+        # Precomputed delay tables per profile ('' is the manual settings)
+        self.timing_tables = {}
+        # Profiles whose table a typing session has used and needs new delays
+        self.stale_timing_tables = set()
+        self.timing_table = array('d')
+        self.timing_index = 0
+        
         # Load settings BEFORE creating GUI
         self.load_settings()
         
+        # Compile every profile's timing table up front so switching is a lookup
+        for name in self.settings['profiles']:
+            self.get_timing_table(name)
+        self.apply_profile(self.settings['profile'])
+        self.timing_table = self.get_timing_table(self.settings['profile'])
+        
         # Create the GUI - this creates the variables and entry fields
         self.create_gui()
         
@@ -69,8 +183,7 @@ class ClipboardTyper:
                     print(f"Settings loaded from file: {loaded_settings}")
                     
                     # Check for required keys
-                    required_keys = ['hotkey', 'stop_key', 'min_delay', 'max_delay']
-                    missing_keys = [key for key in required_keys if key not in loaded_settings]
+                    missing_keys = [key for key in self.required_settings if key not in loaded_settings]
                     
                     if missing_keys:
                         print(f"Warning: Missing required keys in settings file: {missing_keys}")
@@ -116,18 +229,58 @@ class ClipboardTyper:
             print(f"Error registering stop key: {e}")
             self.status_var.set(f"Error registering stop key: {str(e)}")
             
+        self.register_mode_hotkeys()
+    
+    def register_mode_hotkeys(self):
+        """Register the segment and profile hotkeys on top of the main ones."""
+        self.register_segment_hotkeys()
+        self.register_profile_hotkeys()
+    
+    def register_profile_hotkeys(self):
+        """Register one hotkey per profile. Switching never touches the hooks."""
+        for name, profile in self.settings['profiles'].items():
+            key = profile.get('hotkey')
+            if not key:
+                continue
+            try:
+                keyboard.add_hotkey(key, self.switch_profile, args=(name,), suppress=True)
+                print(f"Successfully registered profile key '{key}' for '{name}'")
+            except Exception as e:
+                print(f"Error registering profile key for '{name}': {e}")
+                self.status_var.set(f"Error registering profile key: {str(e)}")
+    
+    def register_segment_hotkeys(self):
+        """Register the previous/repeat segment hotkeys when segment mode is on."""
+        if not self.settings['segment_mode']:
+            return
+            
+        segment_keys = [
+            (self.settings['prev_segment_key'], 'prev'),
+            (self.settings['repeat_segment_key'], 'repeat')
+        ]
+        for key, step in segment_keys:
+            if not key:
+                continue
+            try:
+                keyboard.add_hotkey(key, self.start_segment, args=(step,), suppress=True)
+                print(f"Successfully registered {step} segment key '{key}'")
+            except Exception as e:
+                print(f"Error registering {step} segment key: {e}")
+                self.status_var.set(f"Error registering segment key: {str(e)}")
+            
     def save_settings(self):
         """Save current settings to a JSON file."""
         settings_file = 'clipboard_typer_settings.json'
         try:
-            # Make a copy of settings for writing to file to avoid race conditions
-            settings_to_save = self.settings.copy()
-            
-            print(f"Saving settings to file: {settings_to_save}")
-            
-            with open(settings_file, 'w') as f:
-                json.dump(settings_to_save, f)
+            with self.settings_lock:
+                # Make a copy of settings for writing to file to avoid race conditions
+                settings_to_save = self.settings.copy()
                 
+                print(f"Saving settings to file: {settings_to_save}")
+                
+                with open(settings_file, 'w') as f:
+                    json.dump(settings_to_save, f)
+                    
             print(f"Settings saved successfully to {settings_file}")
         except Exception as e:
             print(f"Error saving settings: {e}")
@@ -137,7 +290,7 @@ class ClipboardTyper:
         """Create the GUI for the application."""
         self.root = tk.Tk()
         self.root.title("Clipboard Typing Simulator")
-        self.root.geometry("400x450")  # Increase height to ensure buttons are visible
+        self.root.geometry("400x585")  # Increase height to ensure buttons are visible
         self.root.resizable(False, False)
         
         # Create a style object
@@ -165,6 +318,23 @@ class ClipboardTyper:
         speed_frame = ttk.LabelFrame(main_frame, text="Typing Speed (seconds)")
         speed_frame.pack(fill=tk.X, pady=10)
         
+        # Profile selector
+        profile_frame = ttk.Frame(speed_frame)
+        profile_frame.pack(fill=tk.X, pady=5)
+        
+        ttk.Label(profile_frame, text="Profile:").pack(side=tk.LEFT)
+        
+        self.profile_var = tk.StringVar(value=self.settings['profile'])
+        profile_box = ttk.Combobox(
+            profile_frame,
+            textvariable=self.profile_var,
+            values=list(self.settings['profiles']),
+            state='readonly',
+            width=18
+        )
+        profile_box.pack(side=tk.LEFT, padx=5)
+        profile_box.bind('<<ComboboxSelected>>', lambda e: self.switch_profile(self.profile_var.get()))
+        
         # Min delay
         min_delay_frame = ttk.Frame(speed_frame)
         min_delay_frame.pack(fill=tk.X, pady=5)
@@ -241,6 +411,39 @@ class ClipboardTyper:
         )
         self.record_stop_btn.pack(side=tk.LEFT, padx=5)
         
+        # Typing mode frame
+        mode_frame = ttk.LabelFrame(main_frame, text="Mode")
+        mode_frame.pack(fill=tk.X, pady=10)
+        
+        hybrid_frame = ttk.Frame(mode_frame)
+        hybrid_frame.pack(fill=tk.X)
+        
+        self.hybrid_var = tk.BooleanVar(value=self.settings['hybrid_mode'])
+        ttk.Checkbutton(
+            hybrid_frame,
+            text="Hybrid paste/type (paste large segments)",
+            variable=self.hybrid_var
+        ).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        segment_frame = ttk.Frame(mode_frame)
+        segment_frame.pack(fill=tk.X)
+        
+        self.segment_mode_var = tk.BooleanVar(value=self.settings['segment_mode'])
+        ttk.Checkbutton(
+            segment_frame,
+            text="One segment per press",
+            variable=self.segment_mode_var
+        ).pack(side=tk.LEFT, padx=5, pady=5)
+        
+        ttk.Button(
+            segment_frame,
+            text="File...",
+            command=self.choose_segment_file
+        ).pack(side=tk.LEFT, padx=5)
+        
+        self.segment_var = tk.StringVar(value=self.describe_segment_source())
+        ttk.Label(segment_frame, textvariable=self.segment_var).pack(side=tk.LEFT, padx=5)
+        
         # Theme selector frame
         theme_frame = ttk.LabelFrame(main_frame, text="Theme")
         theme_frame.pack(fill=tk.X, pady=10)
@@ -413,6 +616,7 @@ class ClipboardTyper:
                 print(f"Re-registering original hotkeys: {self.settings['hotkey']} and {self.settings['stop_key']}")
                 keyboard.add_hotkey(self.settings['hotkey'], self.toggle_typing)
                 keyboard.add_hotkey(self.settings['stop_key'], self.stop_typing)
+                self.register_mode_hotkeys()
             except Exception as e:
                 print(f"Error re-registering hotkeys after recording: {e}")
             
@@ -494,6 +698,7 @@ class ClipboardTyper:
             try:
                 keyboard.add_hotkey(self.settings['hotkey'], self.toggle_typing)
                 keyboard.add_hotkey(self.settings['stop_key'], self.stop_typing)
+                self.register_mode_hotkeys()
             except Exception as e:
                 print(f"Error re-registering hotkeys after stop key recording: {e}")
                 
@@ -530,6 +735,8 @@ class ClipboardTyper:
             hotkey = self.hotkey_entry.get()
             stop_key = self.stop_key_entry.get()
             theme = self.theme_var.get()
+            hybrid_mode = bool(self.hybrid_var.get())
+            segment_mode = bool(self.segment_mode_var.get())
             
             print(f"Reading from UI - hotkey: '{hotkey}', stop_key: '{stop_key}', start_delay: {start_delay}")
             
@@ -553,9 +760,22 @@ class ClipboardTyper:
             self.settings['min_delay'] = min_delay
             self.settings['max_delay'] = max_delay
             self.settings['start_delay'] = start_delay
+            
+            # Saved delays belong to the active profile, so recompile its table
+            profile_name = self.settings['profile']
+            if profile_name in self.settings['profiles']:
+                profile = self.settings['profiles'][profile_name]
+                profile['min_delay'] = min_delay
+                profile['max_delay'] = max_delay
+                profile['start_delay'] = start_delay
+            self.timing_tables.pop(profile_name, None)
+            self.stale_timing_tables.discard(profile_name)
+            self.timing_table = self.get_timing_table(profile_name)
             self.settings['hotkey'] = hotkey
             self.settings['stop_key'] = stop_key
             self.settings['theme'] = theme
+            self.settings['hybrid_mode'] = hybrid_mode
+            self.settings['segment_mode'] = segment_mode
             
             print(f"Updated settings dictionary: {self.settings}")
             
@@ -575,6 +795,8 @@ class ClipboardTyper:
                 print(f"Error registering new stop key: {e}")
                 self.status_var.set(f"Error registering stop key: {str(e)}")
             
+            self.register_mode_hotkeys()
+            
             # Save to file AFTER registering hotkeys
             self.save_settings()
             
@@ -610,6 +832,10 @@ class ClipboardTyper:
     def start_typing(self):
         """Start typing text from the clipboard."""
         print("Starting typing...")
+        if self.settings['segment_mode']:
+            self.start_segment('next')
+            return
+            
         if not self.typing:
             clipboard_text = pyperclip.paste()
             if clipboard_text:
@@ -622,6 +848,170 @@ class ClipboardTyper:
             else:
                 self.status_var.set("Error: Clipboard is empty")
     
+    def start_segment(self, step):
+        """Type the next, previous or last typed segment of the segment source."""
+        if self.typing:
+            return False
+            
+        try:
+            self.load_segment_source()
+        except Exception as e:
+            print(f"Error loading segment source: {e}")
+            self.status_var.set(f"Error loading segments: {str(e)}")
+            return False
+            
+        count = len(self.segment_offsets)
+        if not count:
+            self.status_var.set("Error: Nothing to type")
+            return False
+            
+        # segment_position is the index of the next segment to type
+        if step == 'next':
+            index = self.segment_position
+            if index >= count:
+                self.status_var.set(f"All {count} segments typed")
+                return False
+        elif step == 'repeat':
+            index = max(self.segment_position - 1, 0)
+        else:
+            index = max(self.segment_position - 2, 0)
+            
+        self.segment_position = index + 1
+        self.settings['segment_position'] = self.segment_position
+        self.segment_var.set(self.describe_segment_source())
+        
+        self.typing = True
+        self.status_var.set(f"Typing segment {index + 1}/{count}...")
+        self.start_btn.config(text="Stop Typing")
+        
+        threading.Thread(target=self.type_segment, args=(self.get_segment(index),), daemon=True).start()
+        return False
+    
+    def type_segment(self, segment):
+        """Type one segment and remember the position for the next run."""
+        self.type_text(segment)
+        self.schedule_position_save()
+    
+    def schedule_position_save(self):
+        """Save the segment position once the hotkey presses have paused for a while."""
+        if self.position_save_timer is not None:
+            self.position_save_timer.cancel()
+        self.position_save_timer = threading.Timer(5.0, self.save_segment_position)
+        self.position_save_timer.daemon = True
+        self.position_save_timer.start()
+    
+    def save_segment_position(self):
+        """Write only the segment position fields into the settings file.
+        
+        Falls back to a full save when there is no complete settings file
+        yet, since load_settings would throw a partial one away.
+        """
+        settings_file = 'clipboard_typer_settings.json'
+        try:
+            with self.settings_lock:
+                saved_settings = None
+                if os.path.exists(settings_file):
+                    try:
+                        with open(settings_file, 'r') as f:
+                            saved_settings = json.load(f)
+                    except ValueError as e:
+                        print(f"Settings file unreadable, saving all settings: {e}")
+                        
+                complete = isinstance(saved_settings, dict) and all(
+                    key in saved_settings for key in self.required_settings
+                )
+                if complete:
+                    for key in ('segment_file', 'segment_position', 'segment_fingerprint'):
+                        saved_settings[key] = self.settings[key]
+                        
+                    with open(settings_file, 'w') as f:
+                        json.dump(saved_settings, f)
+                        
+            if not complete:
+                self.save_settings()
+                return
+                
+            print(f"Saved segment position {self.settings['segment_position']}")
+        except Exception as e:
+            print(f"Error saving segment position: {e}")
+    
+    def load_segment_source(self):
+        """Read the segment file or clipboard and rebuild the index if it changed."""
+        delimiter = self.settings['segment_delimiter'] or '\n'
+        path = self.settings['segment_file']
+        
+        if path:
+            stat = os.stat(path)
+            source_key = ('file', path, stat.st_mtime, stat.st_size, delimiter)
+            if source_key == self.segment_source_key:
+                return
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        else:
+            text = pyperclip.paste()
+            source_key = ('clipboard', delimiter)
+            if source_key == self.segment_source_key and text == self.segment_text:
+                return
+                
+        self.build_segment_index(text, delimiter)
+        self.segment_source_key = source_key
+    
+    def build_segment_index(self, text, delimiter):
+        """Index the start offset of every segment so any segment can be sliced in O(1)."""
+        offsets = array('q', [0]) if text else array('q')
+        # finditer keeps the scan in C and never builds a list of lines
+        offsets.extend(match.end() for match in re.finditer(re.escape(delimiter), text))
+        
+        # A trailing delimiter doesn't start another segment
+        if offsets and offsets[-1] == len(text):
+            offsets.pop()
+            
+        self.segment_text = text
+        self.segment_offsets = offsets
+        
+        # Resume where we left off if this is the same source as last time
+        fingerprint = hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+        if fingerprint == self.settings['segment_fingerprint']:
+            self.segment_position = min(self.settings['segment_position'], len(offsets))
+        else:
+            self.segment_position = 0
+        self.settings['segment_fingerprint'] = fingerprint
+        self.settings['segment_position'] = self.segment_position
+        
+        print(f"Indexed {len(offsets)} segments, resuming at segment {self.segment_position + 1}")
+    
+    def get_segment(self, index):
+        """Slice a segment out of the indexed text, without its delimiter."""
+        delimiter = self.settings['segment_delimiter'] or '\n'
+        start = self.segment_offsets[index]
+        if index + 1 < len(self.segment_offsets):
+            end = self.segment_offsets[index + 1] - len(delimiter)
+        elif self.segment_text.endswith(delimiter):
+            end = len(self.segment_text) - len(delimiter)
+        else:
+            end = len(self.segment_text)
+        segment = self.segment_text[start:end]
+        
+        # Windows clipboards end lines with \r\n
+        if segment.endswith('\r'):
+            segment = segment[:-1]
+        return segment
+    
+    def describe_segment_source(self):
+        """Short description of the segment source and position for the GUI."""
+        source = os.path.basename(self.settings['segment_file']) or "clipboard"
+        if self.segment_text is None:
+            return f"Source: {source}"
+        return f"{source}: {self.segment_position}/{len(self.segment_offsets)}"
+    
+    def choose_segment_file(self):
+        """Pick a file to step through, or go back to the clipboard on cancel."""
+        path = filedialog.askopenfilename(title="Choose a file to type segment by segment")
+        self.settings['segment_file'] = path or ''
+        self.segment_source_key = None
+        self.segment_text = None
+        self.segment_var.set(self.describe_segment_source())
+    
     def stop_typing(self):
         """Stop the typing simulation."""
         print("Stopping typing...")
@@ -636,30 +1026,491 @@ class ClipboardTyper:
         start_delay = self.settings['start_delay']
         print(f"Starting typing with {start_delay}s initial delay...")
         self.status_var.set(f"Starting in {start_delay}s...")
-        time.sleep(start_delay)
+        
+        # Fresh delays if an earlier session used these, drawn before the start
+        # delay runs out. Other profiles get theirs when switch_profile selects them.
+        wake_time = time.time() + start_delay
+        profile_name = self.settings['profile']
+        if profile_name in self.stale_timing_tables:
+            self.redraw_timing_table(profile_name)
+        self.stale_timing_tables.add(profile_name)
+        time.sleep(max(wake_time - time.time(), 0))
+        
+        self.preprocess_counts = {}
         
         try:
-            # Type each character with a random delay
-            for char in text:
-                if not self.typing:
-                    break
-                    
-                # Type the character
-                keyboard.write(char)
-                
-                # Random delay between characters
-                delay = random.uniform(self.settings['min_delay'], self.settings['max_delay'])
-                time.sleep(delay)
+            if self.settings['hybrid_mode']:
+                self.type_hybrid(text)
+            else:
+                self.type_chars(text)
         except Exception as e:
             print(f"Error during typing: {e}")
             self.status_var.set(f"Error during typing: {str(e)}")
         finally:
             # Set typing to False when done
             self.typing = False
+            saved = self.report_preprocessing()
             if self.root and self.root.winfo_exists():
-                self.status_var.set("Typing completed")
+                if saved:
+                    self.status_var.set(f"Typing completed ({saved} keystrokes saved)")
+                else:
+                    self.status_var.set("Typing completed")
                 self.start_btn.config(text="Start Typing")
     
+    def type_chars(self, text):
+        """Type preprocessed text one keystroke at a time. Returns False if typing was stopped."""
+        # Type each keystroke with a random delay
+        for key in self.preprocess(text):
+            if not self.typing:
+                return False
+                
+            # Type the character, or send the key for named keys
+            if len(key) == 1:
+                keyboard.write(key)
+            else:
+                keyboard.send(key)
+            
+            # Random delay between characters
+            time.sleep(self.next_delay())
+        return True
+    
+    def next_delay(self):
+        """Return the next delay from the active profile's timing table."""
+        # Read the table once, a profile switch may swap it at any time
+        table = self.timing_table
+        if self.timing_index >= len(table):
+            # Used up, so long sessions don't repeat the same delays
+            table = self.redraw_timing_table(self.settings['profile'])
+        delay = table[self.timing_index]
+        self.timing_index += 1
+        return delay
+    
+    def redraw_timing_table(self, name):
+        """Replace a profile's cached table with fresh delays from the same parameters."""
+        self.timing_tables.pop(name, None)
+        table = self.get_timing_table(name)
+        if name == self.settings['profile']:
+            self.timing_table = table
+            self.timing_index = 0
+        return table
+    
+    def get_timing_table(self, name):
+        """Return the cached timing table for a profile, compiling it on first use."""
+        table = self.timing_tables.get(name)
+        if table is None:
+            params = self.settings['profiles'].get(name, self.settings)
+            table = self.compile_timing_table(params)
+            self.timing_tables[name] = table
+        return table
+    
+    def compile_timing_table(self, params, size=1024):
+        """Draw a table of inter-key delays from a profile's distribution and burst settings."""
+        min_delay = self.timing_param(params, 'min_delay')
+        max_delay = self.timing_param(params, 'max_delay')
+        distribution = params.get('distribution', 'uniform')
+        burst_length = int(self.timing_param(params, 'burst_length'))
+        burst_pause = self.timing_param(params, 'burst_pause')
+        
+        if min_delay > max_delay:
+            min_delay, max_delay = max_delay, min_delay
+            
+        if distribution not in ('uniform', 'gauss'):
+            print(f"Unknown delay distribution '{distribution}', using uniform")
+            distribution = 'uniform'
+            
+        # Keep whole bursts in the table so the pattern lines up when it wraps
+        if burst_length > 0:
+            size = max(size // burst_length, 1) * burst_length
+            
+        table = array('d')
+        for i in range(size):
+            if distribution == 'gauss':
+                # Centered between the bounds, clamped to stay inside them
+                delay = random.gauss((min_delay + max_delay) / 2, (max_delay - min_delay) / 4)
+                delay = min(max(delay, min_delay), max_delay)
+            else:
+                delay = random.uniform(min_delay, max_delay)
+                
+            if burst_length > 0 and (i + 1) % burst_length == 0:
+                delay += burst_pause * random.uniform(0.5, 1.5)
+            table.append(delay)
+        return table
+    
+    def timing_param(self, params, key):
+        """Read a non-negative number from a profile, falling back to the manual setting."""
+        value = params.get(key, self.settings[key])
+        try:
+            value = float(value)
+            if value < 0:
+                raise ValueError("cannot be negative")
+        except (TypeError, ValueError) as e:
+            print(f"Invalid {key} {value!r} in profile ({e}), using {self.settings[key]}")
+            value = float(self.settings[key])
+        return value
+    
+    def apply_profile(self, name):
+        """Copy a profile's values into the active settings. Returns False if it doesn't exist."""
+        profile = self.settings['profiles'].get(name)
+        if profile is None:
+            return False
+            
+        for key in self.profile_keys:
+            if key not in profile:
+                continue
+            if key == 'preprocess' or key == 'distribution':
+                self.settings[key] = profile[key]
+            elif key == 'burst_length':
+                self.settings[key] = int(self.timing_param(profile, key))
+            else:
+                self.settings[key] = self.timing_param(profile, key)
+                
+        if self.settings['min_delay'] > self.settings['max_delay']:
+            self.settings['min_delay'], self.settings['max_delay'] = self.settings['max_delay'], self.settings['min_delay']
+        self.settings['profile'] = name
+        return True
+    
+    def switch_profile(self, name):
+        """Make a profile active without touching hotkeys or the settings file."""
+        if not self.apply_profile(name):
+            self.status_var.set(f"Error: Unknown profile '{name}'")
+            return False
+            
+        # Swapping the table is all a running typing session needs to pick it up
+        if name in self.stale_timing_tables:
+            # Its delays were already used by a typing session
+            self.stale_timing_tables.discard(name)
+            self.redraw_timing_table(name)
+        else:
+            self.timing_table = self.get_timing_table(name)
+        if self.typing:
+            self.stale_timing_tables.add(name)
+        
+        self.profile_var.set(name)
+        self.min_delay_var.set(str(self.settings['min_delay']))
+        self.max_delay_var.set(str(self.settings['max_delay']))
+        self.start_delay_var.set(str(self.settings['start_delay']))
+        self.status_var.set(f"Profile '{name}' active")
+        print(f"Switched to profile '{name}'")
+        return False
+    
+    def preprocess(self, text):
+        """Chain the configured preprocessing stages over the text as generators."""
+        keys = iter(text)
+        for name in self.settings['preprocess']:
+            stage = self.preprocess_stages.get(name)
+            if stage is None:
+                print(f"Unknown preprocessing stage '{name}', skipping it")
+                continue
+                
+            counts = self.preprocess_counts.setdefault(name, [0, 0])
+            keys = self.count_keys(stage(self.count_keys(keys, counts, 0)), counts, 1)
+        return keys
+    
+    def count_keys(self, keys, counts, index):
+        """Pass keystrokes through while counting them into counts[index]."""
+        for key in keys:
+            counts[index] += 1
+            yield key
+    
+    def report_preprocessing(self):
+        """Print how many keystrokes each stage saved and return the total."""
+        total = 0
+        for name, (keys_in, keys_out) in self.preprocess_counts.items():
+            saved = keys_in - keys_out
+            total += saved
+            print(f"Preprocessing stage '{name}': {keys_in} in, {keys_out} out, {saved} keystrokes saved")
+        return total
+    
+    def stage_normalize_newlines(self, keys):
+        """Turn CRLF and lone CR line breaks into LF so each is typed once."""
+        after_cr = False
+        for key in keys:
+            if key == '\r':
+                after_cr = True
+                yield '\n'
+                continue
+            if key == '\n' and after_cr:
+                after_cr = False
+                continue
+            after_cr = False
+            yield key
+    
+    def stage_nfc(self, keys):
+        """Compose characters with their combining marks (Unicode NFC)."""
+        pending = ''
+        for key in keys:
+            if len(key) == 1 and pending and unicodedata.combining(key):
+                pending += key
+                continue
+                
+            # A new base character, so the pending cluster is complete
+            if pending:
+                yield from unicodedata.normalize('NFC', pending)
+                pending = ''
+            if len(key) == 1:
+                pending = key
+            else:
+                yield key
+                
+        if pending:
+            yield from unicodedata.normalize('NFC', pending)
+    
+    def stage_typeable(self, keys):
+        """Drop control, format, surrogate, private-use and unassigned characters.
+        
+        Line breaks and tabs are kept. Spaces such as no-break space are not
+        printable by Python's definition but are typed like any other text.
+        """
+        for key in keys:
+            if len(key) > 1 or key in '\r\n\t':
+                yield key
+            elif unicodedata.category(key) not in ('Cc', 'Cf', 'Cs', 'Co', 'Cn'):
+                yield key
+    
+    def stage_dedent(self, keys):
+        """Remove indentation common to all lines. Needs the whole text, so it buffers."""
+        keys = list(keys)
+        if any(len(key) > 1 for key in keys):
+            # Named keys can't be joined into text, leave everything as is
+            yield from keys
+            return
+        yield from textwrap.dedent(''.join(keys))
+    
+    def stage_strip_indent(self, keys):
+        """Drop leading whitespace after newlines for editors that auto-indent."""
+        line_start = False
+        for key in keys:
+            if line_start and key in (' ', '\t'):
+                continue
+            line_start = key == '\n'
+            yield key
+    
+    def stage_skip_autoclose(self, keys):
+        """Avoid doubled brackets in editors that auto-close them.
+        
+        Assumes the usual editor behaviour: typing an opening bracket also
+        inserts its closer after the caret, a closing bracket typed right
+        before an auto-inserted one overwrites it, and pressing enter after
+        an opening bracket at the end of a line moves the closers after the
+        caret onto their own line below. Same-line closers are typed as is.
+        When the text closes such a block, down+end jumps onto the editor's
+        closer line instead; a closer that ends a content line is left on
+        that line below. Closers the editor moved along are then stepped
+        over with left/right rather than typed again. An empty block still
+        gets its line break typed first, since that enter is what moves the
+        closer down. Should run after the other stages.
+        """
+        pairs = {'(': ')', '[': ']', '{': '}'}
+        closers = set(pairs.values())
+        # Open brackets, innermost last
+        stack = []
+        # Editor closers right after the caret, nearest first
+        ahead = []
+        # Editor closers the caret just jumped past, nearest first
+        behind = []
+        # Last opener on the current line, if nothing but whitespace follows it
+        trailing_opener = None
+        # Buffered line break and indentation, held back until we know what follows
+        pending = []
+        # Keys yielded so far, to tell whether anything went into a block
+        typed = 0
+        
+        for key in keys:
+            out = []
+            
+            if behind:
+                if key == behind[0]['closer'] and stack and stack[-1] is behind[0]:
+                    # Already on the editor's closer line we jumped past
+                    stack.pop()
+                    behind.pop(0)
+                    continue
+                    
+                # Step back in front of the closers the text hasn't reached yet
+                out += ['left'] * len(behind)
+                for entry in behind:
+                    entry['moved'] = True
+                ahead = behind
+                behind = []
+                
+            if pending:
+                if key in (' ', '\t'):
+                    pending.append(key)
+                    continue
+                    
+                if key in closers and stack and stack[-1]['block'] and stack[-1]['closer'] == key:
+                    entry = stack.pop()
+                    if typed + len(out) == entry['typed']:
+                        # Empty block: the editor hasn't moved the closer down yet
+                        out.append(pending[0])
+                    pending = []
+                    # The editor already put this closer on the next line
+                    out += ['down', 'end']
+                    behind = entry['tail'][1:]
+                    typed += len(out)
+                    yield from out
+                    continue
+                    
+                out += pending
+                pending = []
+                
+            if key == '\n':
+                if trailing_opener is not None:
+                    # Enter between the brackets moves the closers after the caret down
+                    trailing_opener['block'] = True
+                    trailing_opener['typed'] = typed + len(out)
+                    trailing_opener['tail'] = ahead
+                    ahead = []
+                    trailing_opener = None
+                pending.append(key)
+            elif key in (' ', '\t'):
+                out.append(key)
+            elif key in pairs:
+                trailing_opener = {'closer': pairs[key], 'block': False, 'typed': 0, 'tail': [], 'moved': False}
+                stack.append(trailing_opener)
+                ahead.insert(0, trailing_opener)
+                out.append(key)
+            elif key in closers:
+                trailing_opener = None
+                if stack and stack[-1]['closer'] == key:
+                    entry = stack.pop()
+                    if entry['block']:
+                        # Closer ends a content line, the editor's one is on the line below
+                        out += ['down', 'end']
+                        behind = entry['tail'][1:]
+                    elif ahead and ahead[0] is entry:
+                        ahead.pop(0)
+                        # Typing over a closer only works before the caret has moved away
+                        out.append('right' if entry['moved'] else key)
+                    else:
+                        out.append(key)
+                else:
+                    out.append(key)
+            else:
+                trailing_opener = None
+                out.append(key)
+                
+            typed += len(out)
+            yield from out
+            
+        yield from pending
+    
+    def type_hybrid(self, text):
+        """Paste large segments and type the rest, restoring the clipboard afterwards."""
+        original_clipboard = pyperclip.paste()
+        pasted_chars = 0
+        typed_chars = 0
+        
+        try:
+            for segment, pasteable in self.split_segments(text):
+                if not self.typing:
+                    break
+                    
+                if pasteable:
+                    if self.paste_segment(segment):
+                        pasted_chars += len(segment)
+                        continue
+                    print(f"Paste of {len(segment)} chars did not take effect, typing it instead")
+                    
+                if not self.type_chars(segment):
+                    break
+                typed_chars += len(segment)
+        finally:
+            # Put the user's clipboard back no matter how typing ended
+            try:
+                pyperclip.copy(original_clipboard)
+            except Exception as e:
+                print(f"Error restoring clipboard: {e}")
+                
+        print(f"Hybrid typing finished: {pasted_chars} chars pasted, {typed_chars} chars typed")
+    
+    def split_segments(self, text):
+        """Split text into (segment, pasteable) pairs for hybrid mode.
+        
+        Tabs usually move focus to the next field and paste blocking is per
+        field, so every tab is typed and each field is judged on its own.
+        Fields longer than paste_max_length are broken up, preferably at a
+        newline, and pieces shorter than paste_min_length are typed. Line
+        breaks at the end of a pasted piece are typed separately, so the
+        paste probe always has a non-empty last line to check.
+        """
+        min_length = self.settings['paste_min_length']
+        max_length = self.settings['paste_max_length']
+        segments = []
+        
+        fields = text.split('\t')
+        for index, field in enumerate(fields):
+            while field:
+                piece = field
+                if max_length > 0 and len(field) > max_length:
+                    # Prefer cutting right after a newline inside the window
+                    cut = field.rfind('\n', 0, max_length) + 1
+                    if cut <= 0:
+                        cut = max_length
+                    piece = field[:cut]
+                    
+                field = field[len(piece):]
+                
+                body = piece.rstrip('\r\n')
+                if len(body) >= min_length:
+                    segments.append((body, True))
+                    if len(body) < len(piece):
+                        segments.append((piece[len(body):], False))
+                else:
+                    segments.append((piece, False))
+                
+            if index < len(fields) - 1:
+                segments.append(('\t', False))
+                
+        return segments
+    
+    def paste_segment(self, segment):
+        """Paste a segment through the clipboard. Returns True if the probe saw it land."""
+        pyperclip.copy(segment)
+        keyboard.send(self.settings['paste_keystroke'])
+        time.sleep(self.settings['paste_probe_delay'])
+        
+        probe_name = self.settings['paste_probe']
+        probe = self.paste_probes.get(probe_name)
+        if probe is None:
+            print(f"Unknown paste probe '{probe_name}', assuming paste succeeded")
+            return True
+        return probe(segment)
+    
+    def probe_none(self, segment):
+        """Trust that every paste succeeds."""
+        return True
+    
+    def probe_select_copy(self, segment):
+        """Select the last few characters before the caret, copy them and compare with the segment.
+        
+        The selection is made and undone with the same number of shift+arrow
+        presses, so the caret ends up where it was even when the application
+        blocks copying and the clipboard stays empty.
+        """
+        tail = segment[segment.rfind('\n') + 1:]
+        if not tail:
+            # split_segments never pastes a trailing line break, so this
+            # can't be verified; report it as failed rather than trust it
+            print("Paste probe has no last line to compare against")
+            return False
+            
+        # A short suffix is enough to tell a landed paste from existing text
+        expected = tail[-16:]
+        
+        # Clear the clipboard first so a failed copy can't look like a match
+        pyperclip.copy('')
+        for _ in expected:
+            keyboard.send('shift+left')
+        keyboard.send(self.settings['copy_keystroke'])
+        time.sleep(self.settings['paste_probe_delay'])
+        copied = pyperclip.paste()
+        
+        # Shrink the selection back to nothing at the original caret
+        for _ in expected:
+            keyboard.send('shift+right')
+            
+        return copied == expected
+    
     def update_ui(self):
         """Update the UI periodically."""
         try:
@@ -698,6 +1549,7 @@ class ClipboardTyper:
             self.style.configure('TLabelframe', background=theme['bg'])
             self.style.configure('TLabelframe.Label', background=theme['bg'], foreground=theme['fg'])
             self.style.configure('TRadiobutton', background=theme['bg'], foreground=theme['fg'])
+            self.style.configure('TCheckbutton', background=theme['bg'], foreground=theme['fg'])
             
             # Update the settings
             self.settings['theme'] = theme_name
@@ -709,6 +1561,10 @@ class ClipboardTyper:
         print("Closing application...")
         self.stop_typing()
         
+        # The full save below includes the segment position
+        if self.position_save_timer is not None:
+            self.position_save_timer.cancel()
+        
         # Remove all hotkeys and keyboard listeners
         try:
             print("Unhooking all keyboard hooks...")